@@ -0,0 +1,128 @@
+"""
+부재 배치 최적화 DP / 열거 커널 (numba 가 있으면 JIT 컴파일)
+- Streamlit 은 support.py 를 재실행(rerun)마다 다시 exec 하므로, 커널은 별도 모듈로 두어
+  프로세스당 한 번만 컴파일(또는 디스크 캐시 로드)하고 sys.modules 에서 재사용합니다.
+"""
+from array import array
+from typing import Callable, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError: # numba 미설치 시 순수 Python 커널로 동작
+    njit = None
+
+HAS_NUMBA = njit is not None
+
+def _jit(signature: str) -> Callable:
+    """
+    numba 가 설치되어 있으면 DP 커널을 주어진 시그니처로 JIT 컴파일하고, 없으면 그대로 반환합니다.
+    - 시그니처를 지정해 모듈 import 시 한 번 컴파일(또는 캐시 로드)하므로, 호출 시점의 지연 컴파일이 없습니다.
+    """
+    def decorator(func: Callable) -> Callable:
+        if njit is None:
+            return func
+        return njit(signature, cache=True, boundscheck=False, nogil=True)(func)
+    return decorator
+
+def int_buffer(size: int, fill: int = 0) -> Sequence[int]:
+    """
+    DP 용 연속 int32 버퍼를 만듭니다. (셀당 4 바이트)
+    - 순수 Python 커널은 array('i') 를 그대로 사용하고(스칼라 인덱싱이 ndarray 보다 빠름), numba 커널에는 복사 없는 ndarray 뷰를 넘깁니다.
+    """
+    buffer = array('i', [fill]) * size
+    return buffer if njit is None else np.frombuffer(buffer, dtype=np.int32)
+
+def piece_array(pieces: Tuple[int, ...]) -> Sequence[int]:
+    """커널에 넘길 부재 길이 배열. (numba 사용 시 int64 ndarray, 순수 Python 이면 튜플 그대로)"""
+    return pieces if njit is None else np.asarray(pieces, dtype=np.int64)
+
+@_jit("(int64, int64[:], int32[:], int32[:])")
+def dp_large_core(target_capacity, pieces_desc, dp_value, parent):
+    """부재 길이 합 최대화 DP. dp_value/parent 버퍼(0 으로 초기화)를 채우고 최대 합을 반환합니다."""
+    for piece_len in pieces_desc:
+        for i in range(piece_len, target_capacity + 1):
+            if dp_value[i - piece_len] + piece_len > dp_value[i]:
+                dp_value[i] = dp_value[i - piece_len] + piece_len
+                parent[i] = piece_len # i 에 도달하기 위해 마지막으로 추가한 부재 길이
+
+    return dp_value[target_capacity]
+
+@_jit("(int64, int64[:], boolean, int32[:], int32[:], int32[:])")
+def dp_count_core(target_capacity, pieces, prefer_fewer, dp_sum, dp_count, parent):
+    """
+    부재 길이 합 최대화 후 부재 수 최소화(prefer_fewer) 또는 최대화 DP. dp_sum/dp_count/parent 버퍼를 채우고 최대 합을 반환합니다.
+    - prefer_fewer 이면 dp_count[1:] 는 도달 불가 표시용 큰 값으로 초기화되어 있어야 합니다.
+    """
+    for i in range(1, target_capacity + 1):
+        for piece_len in pieces:
+            if i >= piece_len:
+                current_sum_candidate = dp_sum[i - piece_len] + piece_len
+                if current_sum_candidate < dp_sum[i]: # 대부분의 후보는 여기서 탈락 -> 부재 수 비교 생략
+                    continue
+
+                current_num_pieces_candidate = dp_count[i - piece_len] + 1
+                if current_sum_candidate == dp_sum[i]:
+                    if prefer_fewer and current_num_pieces_candidate >= dp_count[i]:
+                        continue
+                    if not prefer_fewer and current_num_pieces_candidate <= dp_count[i]:
+                        continue
+
+                dp_sum[i] = current_sum_candidate
+                dp_count[i] = current_num_pieces_candidate
+                parent[i] = piece_len
+
+    return dp_sum[target_capacity]
+
+@_jit("UniTuple(int64, 2)(int64, int64[:], int32[:], int32[:])")
+def enumerate_count_core(target_capacity, pieces_desc, counts, best_counts):
+    """
+    부재별 개수 벡터 (n0, ..., nk-1) 를 직접 열거하여 부재 수 최소 / 최대 전략의 최적 개수 벡터를 한 번에 구합니다.
+    - 마지막(가장 작은) 부재 개수는 '남은 공간 // 부재 길이' 로 바로 결정되므로 앞의 k-1 개만 열거합니다.
+    - counts 는 길이 k 작업 버퍼, best_counts 는 길이 2k 결과 버퍼 (앞 k 개: 부재 수 최소, 뒤 k 개: 부재 수 최대)
+    - 반환: (부재 수 최소 조합의 합, 부재 수 최대 조합의 합)
+    """
+    k = len(pieces_desc)
+    min_sum = -1
+    min_num_pieces = 0
+    max_sum = -1
+    max_num_pieces = 0
+
+    remaining = target_capacity
+    prefix_num_pieces = 0
+    while True:
+        last_count = remaining // pieces_desc[k - 1]
+        current_sum = target_capacity - remaining + last_count * pieces_desc[k - 1]
+        current_num_pieces = prefix_num_pieces + last_count
+
+        # 열거 순서상 나중 벡터일수록 큰 부재가 많으므로, 동률이면 나중 것을 채택 (큰 부재 우선)
+        if current_sum > min_sum or (current_sum == min_sum and current_num_pieces <= min_num_pieces):
+            min_sum = current_sum
+            min_num_pieces = current_num_pieces
+            for j in range(k - 1):
+                best_counts[j] = counts[j]
+            best_counts[k - 1] = last_count
+        if current_sum > max_sum or (current_sum == max_sum and current_num_pieces >= max_num_pieces):
+            max_sum = current_sum
+            max_num_pieces = current_num_pieces
+            for j in range(k - 1):
+                best_counts[k + j] = counts[j]
+            best_counts[2 * k - 1] = last_count
+
+        # 오도미터 방식으로 다음 개수 벡터로 이동 (뒤쪽 부재부터 증가, 넘치면 0 으로 되돌리고 앞 자리 증가)
+        j = k - 2
+        while j >= 0:
+            if remaining >= pieces_desc[j]:
+                counts[j] += 1
+                remaining -= pieces_desc[j]
+                prefix_num_pieces += 1
+                break
+            remaining += counts[j] * pieces_desc[j]
+            prefix_num_pieces -= counts[j]
+            counts[j] = 0
+            j -= 1
+        if j < 0:
+            break
+
+    return min_sum, max_sum
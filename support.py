@@ -1,8 +1,12 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import plotly.graph_objects as go
-from typing import List, Dict, Any, Tuple, Callable
+from typing import List, Dict, Any, Tuple, Callable, Sequence, Optional
 from collections import Counter
-import copy
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import math
+from dp_kernels import HAS_NUMBA, int_buffer, piece_array, dp_large_core, dp_count_core, enumerate_count_core
 
 # --- 설정 ---
 AVAILABLE_PIECE_LENGTHS_MASTER = [1829, 1524, 1219, 914, 610, 305] # 마스터 부재 길이 목록 (큰 값부터 정렬)
@@ -17,113 +21,156 @@ PIECE_COLOR_MAP_DEFAULT = {
 }
 PLOTLY_COLORS_FALLBACK = ['#e377c2', '#7f7f7f', '#bcbd22', '#17becf', '#aec7e8', '#ffbb78', '#98df8a', '#ff9896', '#c5b0d5'] # 대체 색상 팔레트
 
+def _build_active_color_map() -> Dict[int, str]:
+    """마스터 부재 길이별 색상 매핑을 생성합니다. (고정 색상이 없으면 대체 팔레트 사용)"""
+    active_color_map = {}
+    color_idx = 0
+    for piece_val in AVAILABLE_PIECE_LENGTHS_MASTER:
+        if piece_val in PIECE_COLOR_MAP_DEFAULT:
+            active_color_map[piece_val] = PIECE_COLOR_MAP_DEFAULT[piece_val]
+        else:
+            active_color_map[piece_val] = PLOTLY_COLORS_FALLBACK[color_idx % len(PLOTLY_COLORS_FALLBACK)]
+            color_idx += 1
+    return active_color_map
+
+ACTIVE_COLOR_MAP = _build_active_color_map() # 부재 길이 -> 색상 (모듈 로드 시 1회 계산)
+
 MARGIN_COLOR = "lightgrey" # 여백 색상
 ERROR_COLOR = "rgba(255, 100, 100, 0.3)" # 오류 표시 배경색 (부드러운 빨강)
-
-# --- 최적화 함수 ---
-def optimize_dp_max_fill_large_priority(target_capacity: int, piece_types: List[int]) -> Tuple[int, List[int]]:
+PLOTLY_STATIC_CONFIG = {'staticPlot': True, 'displayModeBar': False} # 차트는 보기 전용 (확대/호버 등 상호작용 없음)
+_LIGHT_COLORS = frozenset({MARGIN_COLOR, ERROR_COLOR, "yellow", "lightyellow", "lightcyan", "white"}) # 검은 글씨를 쓰는 밝은 배경색
+
+# --- 최적화 함수 (입력이 같으면 st.cache_data 로 결과 재사용) ---
+# piece_types_sorted_desc: 중복 없이 내림차순 정렬된 부재 길이 튜플 (호출 측에서 한 번만 정렬)
+def _reconstruct_combination(parent: Sequence[int], target_capacity: int) -> List[int]:
+    """parent 배열을 역추적하여 부재 조합을 복원합니다. (큰 값부터 정렬)"""
+    combination = []
+    i = target_capacity
+    while parent[i]:
+        combination.append(int(parent[i]))
+        i -= int(parent[i])
+    return sorted(combination, reverse=True)
+
+def _scaled_dp(target_capacity: int, pieces: Tuple[int, ...], prefer_fewer: Optional[bool] = None) -> Tuple[int, List[int]]:
+    """
+    부재 길이의 최대공약수 g 로 용량과 부재 길이를 나눈 뒤 DP 커널을 실행합니다.
+    - prefer_fewer 가 None 이면 합 최대화 DP, True/False 이면 합 최대화 후 부재 수 최소/최대화 DP 를 사용합니다.
+    - 모든 부재 합은 g 의 배수이므로 결과는 동일하고, DP 배열 크기와 반복 횟수는 1/g 로 줄어듭니다.
+    """
+    g = math.gcd(*pieces)
+    scaled_capacity = target_capacity // g
+    scaled_pieces = piece_array(tuple(piece_len // g for piece_len in pieces))
+    dp_sum = int_buffer(scaled_capacity + 1)
+    parent = int_buffer(scaled_capacity + 1)
+    if prefer_fewer is None:
+        best_sum = dp_large_core(scaled_capacity, scaled_pieces, dp_sum, parent)
+    else:
+        dp_count = int_buffer(scaled_capacity + 1, 1 << 30 if prefer_fewer else 0) # 도달 불가 표시용 큰 값
+        dp_count[0] = 0
+        best_sum = dp_count_core(scaled_capacity, scaled_pieces, prefer_fewer, dp_sum, dp_count, parent)
+    return int(best_sum) * g, [piece_len * g for piece_len in _reconstruct_combination(parent, scaled_capacity)]
+
+_FILL_MIN_PIECES, _FILL_MAX_PIECES = range(2) # _enumerate_best_fills 결과 인덱스
+
+def _prefer_enumeration(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> bool:
+    """
+    개수 벡터 열거 횟수 추정치가 DP 반복 횟수보다 작으면 True 를 반환합니다.
+    - 열거 횟수 ~ prod(C / p_j + 1) / (k-1)! (가장 작은 부재 제외), DP 반복 횟수 = (C / g) * k
+    - 순수 Python 에서는 열거 한 단계가 DP 한 셀보다 훨씬 비싸 오히려 느려지므로, numba 가 있을 때만 사용합니다.
+    """
+    if not HAS_NUMBA:
+        return False
+    estimate = 1.0
+    for j, piece_len in enumerate(piece_types_sorted_desc[:-1], start=1):
+        estimate *= (target_capacity / piece_len + 1) / j
+    return estimate <= (target_capacity // math.gcd(*piece_types_sorted_desc)) * len(piece_types_sorted_desc)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _enumerate_best_fills(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> List[Tuple[int, List[int]]]:
+    """개수 벡터 열거 1회로 부재 수 최소 / 최대 전략의 (합, 조합)을 함께 구합니다. (_FILL_* 인덱스 순서)"""
+    k = len(piece_types_sorted_desc)
+    best_counts = int_buffer(2 * k)
+    best_sums = enumerate_count_core(target_capacity, piece_array(piece_types_sorted_desc), int_buffer(k), best_counts)
+    return [
+        (int(best_sums[r]), [piece_len for piece_len, count in zip(piece_types_sorted_desc, best_counts[r * k:(r + 1) * k]) for _ in range(count)])
+        for r in range(2)
+    ]
+
+def _greedy_exact_fill(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> Optional[List[int]]:
+    """그리디(전략 3) 결과가 가용 공간을 정확히 채우면 그 조합을, 아니면 None 을 반환합니다."""
+    greedy_sum, greedy_combination = optimize_greedy_largest_first(target_capacity, piece_types_sorted_desc)
+    return greedy_combination if greedy_sum == target_capacity else None
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def optimize_dp_max_fill_large_priority(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> Tuple[int, List[int]]:
     """
     전략 2: 여백 최소화 초점 (가용 공간 최대 활용)
     - 부재 길이 합을 최대화합니다. (Internal Waste 최소화)
-    - piece_types 리스트가 내림차순으로 정렬되어 있으면 큰 부재를 우선적으로 고려하는 경향이 있습니다.
+    - piece_types_sorted_desc 가 내림차순으로 정렬되어 있으므로 큰 부재를 우선적으로 고려하는 경향이 있습니다.
     """
-    if target_capacity <= 0 or not piece_types:
+    if target_capacity <= 0 or not piece_types_sorted_desc:
         return 0, []
-    sorted_piece_types = sorted(list(set(piece_types)), reverse=True)
-
-    dp_value = [0] * (target_capacity + 1)
-    dp_combination = [[] for _ in range(target_capacity + 1)]
-
-    for piece_len in sorted_piece_types:
-        for i in range(piece_len, target_capacity + 1):
-            if dp_value[i - piece_len] + piece_len > dp_value[i]:
-                dp_value[i] = dp_value[i - piece_len] + piece_len
-                dp_combination[i] = dp_combination[i - piece_len] + [piece_len]
+    # 합이 같은 조합이 여럿이면 어느 조합을 고를지는 DP 순서가 결정하므로, 그리디 단축이나 열거 없이 항상 DP 로 계산
+    return _scaled_dp(target_capacity, piece_types_sorted_desc)
 
-    return dp_value[target_capacity], sorted(dp_combination[target_capacity], reverse=True)
-
-def optimize_dp_max_fill_min_pieces(target_capacity: int, piece_types: List[int]) -> Tuple[int, List[int]]:
+@st.cache_data(max_entries=128, show_spinner=False)
+def optimize_dp_max_fill_min_pieces(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> Tuple[int, List[int]]:
     """
     전략 1: AI 추천 최적 (남은 공간 최소화 후, 사용 부재 수 최소화)
     - 부재 길이 합을 최대화하고, 그 다음으로 부재 수를 최소화합니다.
     """
-    if target_capacity <= 0 or not piece_types:
+    if target_capacity <= 0 or not piece_types_sorted_desc:
         return 0, []
-    dp_state = [(0, float('inf'), []) for _ in range(target_capacity + 1)]
-    dp_state[0] = (0, 0, [])
-
-    sorted_piece_types = sorted(list(set(piece_types)), reverse=True)
-
-    for i in range(1, target_capacity + 1):
-        for piece_len in sorted_piece_types:
-            if i >= piece_len:
-                prev_sum, prev_num_pieces, prev_combo = dp_state[i - piece_len]
-                current_sum_candidate = prev_sum + piece_len
-                current_num_pieces_candidate = prev_num_pieces + 1
-
-                if current_sum_candidate > dp_state[i][0]:
-                    dp_state[i] = (current_sum_candidate, current_num_pieces_candidate, prev_combo + [piece_len])
-                elif current_sum_candidate == dp_state[i][0]:
-                    if current_num_pieces_candidate < dp_state[i][1]:
-                        dp_state[i] = (current_sum_candidate, current_num_pieces_candidate, prev_combo + [piece_len])
-
-    final_sum, _, final_combination = dp_state[target_capacity]
-    return final_sum, sorted(final_combination, reverse=True)
-
-def optimize_dp_max_fill_max_pieces(target_capacity: int, piece_types: List[int]) -> Tuple[int, List[int]]:
+    # 정확히 채우는 조합의 부재 수 하한은 ceil(C / 최대 부재) -> 그리디가 이를 달성하면 DP 생략
+    greedy_combination = _greedy_exact_fill(target_capacity, piece_types_sorted_desc)
+    if greedy_combination is not None and len(greedy_combination) == -(-target_capacity // piece_types_sorted_desc[0]):
+        return target_capacity, greedy_combination
+    if _prefer_enumeration(target_capacity, piece_types_sorted_desc):
+        return _enumerate_best_fills(target_capacity, piece_types_sorted_desc)[_FILL_MIN_PIECES]
+    return _scaled_dp(target_capacity, piece_types_sorted_desc, prefer_fewer=True)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def optimize_dp_max_fill_max_pieces(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> Tuple[int, List[int]]:
     """
     전략 4: 부재 수 최대화 지향 (작은 부재 적극 활용)
     - 부재 길이 합을 최대화하고, 그 다음으로 부재 수를 최대화합니다.
     """
-    if target_capacity <= 0 or not piece_types:
+    if target_capacity <= 0 or not piece_types_sorted_desc:
         return 0, []
-    dp_state = [(0, 0, []) for _ in range(target_capacity + 1)]
-
-    sorted_piece_types_asc = sorted(list(set(piece_types)))
-
-    for i in range(1, target_capacity + 1):
-        for piece_len in sorted_piece_types_asc:
-            if i >= piece_len:
-                prev_sum, prev_num_pieces, prev_combo = dp_state[i - piece_len]
-                current_sum_candidate = prev_sum + piece_len
-                current_num_pieces_candidate = prev_num_pieces + 1
-
-                if current_sum_candidate > dp_state[i][0]:
-                    dp_state[i] = (current_sum_candidate, current_num_pieces_candidate, prev_combo + [piece_len])
-                elif current_sum_candidate == dp_state[i][0]:
-                    if current_num_pieces_candidate > dp_state[i][1]:
-                        dp_state[i] = (current_sum_candidate, current_num_pieces_candidate, prev_combo + [piece_len])
-
-    final_sum, _, final_combination = dp_state[target_capacity]
-    return final_sum, sorted(final_combination, reverse=True)
-
-def optimize_greedy_largest_first(target_capacity: int, piece_types: List[int]) -> Tuple[int, List[int]]:
+    # 부재 수 상한은 C // 최소 부재 -> 그리디가 정확히 채우면서 이를 달성하면 DP 생략
+    greedy_combination = _greedy_exact_fill(target_capacity, piece_types_sorted_desc)
+    if greedy_combination is not None and len(greedy_combination) == target_capacity // piece_types_sorted_desc[-1]:
+        return target_capacity, greedy_combination
+    if _prefer_enumeration(target_capacity, piece_types_sorted_desc):
+        return _enumerate_best_fills(target_capacity, piece_types_sorted_desc)[_FILL_MAX_PIECES]
+    return _scaled_dp(target_capacity, piece_types_sorted_desc[::-1], prefer_fewer=False) # 오름차순으로 탐색
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def optimize_greedy_largest_first(target_capacity: int, piece_types_sorted_desc: Tuple[int, ...]) -> Tuple[int, List[int]]:
     """
     전략 3: 부재 수 최소화 지향 (큰 부재 적극 활용)
     - 사용 가능한 가장 큰 부재부터 차례대로 채워 넣습니다. (그리디 방식)
     """
-    if target_capacity <= 0 or not piece_types:
+    if target_capacity <= 0 or not piece_types_sorted_desc:
         return 0, []
 
     selected_pieces = []
     current_sum = 0
     remaining_capacity = target_capacity
 
-    sorted_piece_types = sorted(list(set(piece_types)), reverse=True)
-
-    for piece_len in sorted_piece_types:
+    for piece_len in piece_types_sorted_desc:
         while remaining_capacity >= piece_len:
             selected_pieces.append(piece_len)
             current_sum += piece_len
             remaining_capacity -= piece_len
-    return current_sum, sorted(selected_pieces, reverse=True)
+    return current_sum, selected_pieces
 
 # --- 레이아웃 계산 ---
 def calculate_single_strategy_layout(
     strategy_name: str,
     optimization_func: Callable,
     total_length: float,
-    user_selected_piece_types: List[int],
+    piece_types_sorted_desc: Tuple[int, ...],
     base_min_end_margin: float,
     input_alpha_for_margin: float,
     internal_alpha_distribution_method: str
@@ -132,11 +179,11 @@ def calculate_single_strategy_layout(
     results: Dict[str, Any] = {
         "strategy_name": strategy_name, "status": "오류", "message": "", "plot_elements": [], "summary": {},
         "internal_alpha_waste": 0.0, "final_left_margin": 0.0, "final_right_margin": 0.0,
-        "selected_pieces_combination": []
+        "selected_pieces_combination": [], "piece_counter": Counter()
     }
     results["summary"]["전략명"] = strategy_name
 
-    if not user_selected_piece_types:
+    if not piece_types_sorted_desc:
         results["message"] = "선택된 부재가 없어 배치를 계산할 수 없습니다. (양 끝 여백만 적용됩니다)"
         pass
 
@@ -148,17 +195,18 @@ def calculate_single_strategy_layout(
     if usable_space_for_pieces < 0:
         results["message"] = f"배치 오류: 사용자 지정 양 끝 여백의 합({2 * current_min_end_margin:,.0f})이 전체 길이({total_length:,.0f})를 초과합니다."
         plot_elements = [
-            {'label': '요구된 좌측 여백', 'start': 0, 'end': current_min_end_margin, 'length': current_min_end_margin, 'type': 'margin', 'color': ERROR_COLOR},
-            {'label': '요구된 우측 여백', 'start': total_length - current_min_end_margin, 'end': total_length, 'length': current_min_end_margin, 'type': 'margin', 'color': ERROR_COLOR},
+            {'label': '요구된 좌측 여백', 'start': 0, 'end': current_min_end_margin, 'length': current_min_end_margin, 'type': 'margin', 'color': ERROR_COLOR, 'anno_text': f"{current_min_end_margin:,.0f}"},
+            {'label': '요구된 우측 여백', 'start': total_length - current_min_end_margin, 'end': total_length, 'length': current_min_end_margin, 'type': 'margin', 'color': ERROR_COLOR, 'anno_text': f"{current_min_end_margin:,.0f}"},
             {'label': '전체 길이 한계', 'start': 0, 'end': total_length, 'length': total_length, 'type': 'limit_line', 'color': 'red'}
         ]
         results["plot_elements"] = plot_elements
         results["status"] = "오류"
         return results
 
-    sum_selected_pieces, selected_pieces_combination = optimization_func(int(usable_space_for_pieces), user_selected_piece_types)
+    sum_selected_pieces, selected_pieces_combination = optimization_func(int(usable_space_for_pieces), piece_types_sorted_desc)
 
     results["selected_pieces_combination"] = selected_pieces_combination
+    results["piece_counter"] = Counter(selected_pieces_combination) # 부재 길이별 개수 (시각화/상세 결과에서 재사용)
     results["summary"]["선택된 부재들의 총 길이"] = f"{sum_selected_pieces:,.0f}"
 
     internal_alpha_waste = usable_space_for_pieces - sum_selected_pieces
@@ -187,25 +235,18 @@ def calculate_single_strategy_layout(
     results["final_right_margin"] = final_right_margin
 
     plot_elements = []
-    current_pos = 0.0
 
-    active_color_map = {}
-    color_idx = 0
-    for piece_val in AVAILABLE_PIECE_LENGTHS_MASTER:
-        if piece_val in PIECE_COLOR_MAP_DEFAULT:
-            active_color_map[piece_val] = PIECE_COLOR_MAP_DEFAULT[piece_val]
-        else:
-            active_color_map[piece_val] = PLOTLY_COLORS_FALLBACK[color_idx % len(PLOTLY_COLORS_FALLBACK)]
-            color_idx +=1
+    plot_elements.append({'label': '좌측 여백', 'start': 0.0, 'end': final_left_margin, 'length': final_left_margin, 'type': 'margin', 'color': MARGIN_COLOR, 'anno_text': f"{final_left_margin:,.0f}"})
 
-    plot_elements.append({'label': '좌측 여백', 'start': current_pos, 'end': current_pos + final_left_margin, 'length': final_left_margin, 'type': 'margin', 'color': MARGIN_COLOR})
-    current_pos += final_left_margin
-
-    for p_len in selected_pieces_combination:
-        plot_elements.append({'label': f'부재 ({p_len})', 'start': current_pos, 'end': current_pos + p_len, 'length': p_len, 'type': 'piece', 'color': active_color_map.get(p_len, 'grey')})
-        current_pos += p_len
+    # 부재 시작/끝 위치를 누적합으로 한 번에 계산
+    piece_ends = final_left_margin + np.cumsum(np.asarray(selected_pieces_combination, dtype=np.int64))
+    piece_starts = np.concatenate(([final_left_margin], piece_ends[:-1]))
+    plot_elements.extend(
+        {'label': f'부재 ({p_len})', 'start': float(start), 'end': float(end), 'length': p_len, 'type': 'piece', 'color': ACTIVE_COLOR_MAP.get(p_len, 'grey'), 'anno_text': f"{p_len:,.0f}"}
+        for p_len, start, end in zip(selected_pieces_combination, piece_starts, piece_ends)
+    )
 
-    plot_elements.append({'label': '우측 여백', 'start': current_pos, 'end': total_length, 'length': final_right_margin, 'type': 'margin', 'color': MARGIN_COLOR})
+    plot_elements.append({'label': '우측 여백', 'start': final_left_margin + sum_selected_pieces, 'end': total_length, 'length': final_right_margin, 'type': 'margin', 'color': MARGIN_COLOR, 'anno_text': f"{final_right_margin:,.0f}"})
 
     results["status"] = "성공"
     results["plot_elements"] = plot_elements
@@ -218,7 +259,7 @@ def calculate_single_strategy_layout(
     return results
 
 # --- 시각화 ---
-def create_plotly_visualization(total_length: float, plot_elements: List[Dict[str, Any]], strategy_title: str, strategy_summary_dict: Dict[str, Any], selected_piece_types_for_legend: List[int]) -> go.Figure:
+def create_plotly_visualization(total_length: float, plot_elements: List[Dict[str, Any]], strategy_title: str, strategy_summary_dict: Dict[str, Any], selected_piece_types_for_legend: List[int], piece_counter: Counter) -> go.Figure:
     """레이아웃을 시각화하기 위한 Plotly Figure를 생성합니다."""
     fig = go.Figure()
     annotations = []
@@ -227,41 +268,24 @@ def create_plotly_visualization(total_length: float, plot_elements: List[Dict[st
     text_size = 18
     min_length_for_text = total_length * 0.01
 
-    fig.add_shape(type="rect", x0=0, y0=0, x1=total_length, y1=1,
-                line=dict(color="black", width=3), fillcolor="white", layer="below")
-
-    active_color_map = {}
-    color_idx = 0
-    for piece_val in AVAILABLE_PIECE_LENGTHS_MASTER:
-        if piece_val in PIECE_COLOR_MAP_DEFAULT:
-            active_color_map[piece_val] = PIECE_COLOR_MAP_DEFAULT[piece_val]
-        else:
-            active_color_map[piece_val] = PLOTLY_COLORS_FALLBACK[color_idx % len(PLOTLY_COLORS_FALLBACK)]
-            color_idx += 1
+    # 도형은 dict 로 모아 update_layout 에서 한 번에 설정 (add_shape 호출별 검증 비용 제거)
+    shapes = [dict(type="rect", x0=0, y0=0, x1=total_length, y1=1,
+                   line=dict(color="black", width=3), fillcolor="white", layer="below")]
 
     for el in plot_elements:
         if el['type'] == 'limit_line':
-            fig.add_shape(type="line", x0=el['start'], y0=-0.1, x1=el['start'], y1=1.1,
-                          line=dict(color=el['color'], width=2, dash="dash"), name=el['label'])
+            shapes.append(dict(type="line", x0=el['start'], y0=-0.1, x1=el['start'], y1=1.1,
+                               line=dict(color=el['color'], width=2, dash="dash"), name=el['label']))
             annotations.append(dict(x=el['start'], y=1.15, text=el['label'], showarrow=False,
                                     font=dict(color=el['color'], size=text_size, family="Arial, sans-serif"), xanchor='center'))
             continue
 
-        fig.add_shape(type="rect", x0=el['start'], y0=0, x1=el['end'], y1=1,
-                      fillcolor=el['color'], line=dict(color="black", width=3), name=el['label'])
+        shapes.append(dict(type="rect", x0=el['start'], y0=0, x1=el['end'], y1=1,
+                           fillcolor=el['color'], line=dict(color="black", width=3), name=el['label']))
 
         if el['length'] > min_length_for_text or (el['type'] == 'margin' and el['length'] > 0.01):
-            text_color = "white" if el['color'] not in [MARGIN_COLOR, ERROR_COLOR, "yellow", "lightyellow", "lightcyan", "white"] else "black"
-            anno_text = f"{el['length']:,.0f}"
-
-            if el['type'] == 'piece' and '(' in el['label'] and ')' in el['label']:
-                raw_len_str = el['label'][el['label'].find("(")+1:el['label'].find(")")]
-                try:
-                    anno_text = f"{int(raw_len_str):,.0f}"
-                except ValueError:
-                    anno_text = raw_len_str
-
-            annotations.append(dict(x=(el['start'] + el['end']) / 2, y=y_level, text=anno_text,
+            text_color = "black" if el['color'] in _LIGHT_COLORS else "white"
+            annotations.append(dict(x=(el['start'] + el['end']) / 2, y=y_level, text=el['anno_text'],
                                     showarrow=False, font=dict(color=text_color, size=text_size, family="Arial Black, sans-serif"),
                                     align="center"))
 
@@ -275,22 +299,20 @@ def create_plotly_visualization(total_length: float, plot_elements: List[Dict[st
         xaxis=dict(range=[0, total_length], showgrid=False, zeroline=False, title_text="전체 길이 (mm)", tickformat=",,.0f",
                    titlefont=dict(size=18, family="Arial Black, sans-serif"), tickfont=dict(size=16, family="Arial, sans-serif")),
         yaxis=dict(range=[-0.2, 1.2], showgrid=False, zeroline=False, showticklabels=False, fixedrange=True),
-        annotations=annotations, height=380,
+        shapes=shapes, annotations=annotations, height=380,
         margin=dict(l=20, r=20, t=130, b=60),
         title_text=title_with_summary, title_x=0.5, titlefont=dict(size=26, family="Arial Black, sans-serif"),
-        plot_bgcolor='white', showlegend=True,
+        plot_bgcolor='white', showlegend=True, uirevision='static',
         legend=dict(font=dict(size=14, family="Arial, sans-serif"), itemsizing='constant', orientation="h", yanchor="bottom", y=1.03, xanchor="right", x=1)
     )
 
     legend_items_added = set()
-    piece_counts_in_current_layout = Counter(el['length'] for el in plot_elements if el['type'] == 'piece')
-
     for piece_len_type in sorted(selected_piece_types_for_legend, reverse=True):
-        if piece_counts_in_current_layout[piece_len_type] > 0:
-            color = active_color_map.get(piece_len_type, 'grey')
+        if piece_counter[piece_len_type] > 0:
+            color = ACTIVE_COLOR_MAP.get(piece_len_type, 'grey')
             legend_name_key = (color, piece_len_type)
             if legend_name_key not in legend_items_added:
-                count = piece_counts_in_current_layout[piece_len_type]
+                count = piece_counter[piece_len_type]
                 fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers',
                                          marker=dict(size=16, color=color, line=dict(color='black', width=3)),
                                          name=f"부재: {piece_len_type:,.0f} (x{count})"))
@@ -303,19 +325,54 @@ def create_plotly_visualization(total_length: float, plot_elements: List[Dict[st
                                      name="여백 공간"))
             legend_items_added.add('margin')
 
-    # Add tooltips
-    for el in plot_elements:
-        fig.add_trace(go.Scatter(
-            x=[(el['start'] + el['end']) / 2],
-            y=[0.5],
-            text=[f"{el['label']}: {el['length']:,.0f} mm"],
-            mode='text',
-            showlegend=False,
-            hoverinfo='text'
-        ))
-
     return fig
 
+@st.cache_data(max_entries=128, show_spinner=False)
+def build_figure_dict(total_length: float, plot_elements: List[Dict[str, Any]], strategy_title: str, strategy_summary_dict: Dict[str, Any], selected_piece_types_for_legend: List[int], piece_counter: Counter) -> Dict[str, Any]:
+    """Figure 를 직렬화 가능한 dict 로 만들어 캐싱합니다. (입력이 같으면 Figure 재생성 생략)"""
+    return create_plotly_visualization(total_length, plot_elements, strategy_title, strategy_summary_dict, selected_piece_types_for_legend, piece_counter).to_dict()
+
+# --- HTML 템플릿 (str.format 으로 값만 채움) ---
+_CARD_TEMPLATE = """
+            <div style="background-color: #ffffff; border: 2px solid #e0e0e0; border-radius: 12px; padding: 20px; text-align: center; margin-bottom: 20px; height: 200px; display: flex; flex-direction: column; justify-content: center; box-shadow: 0 4px 8px rgba(0,0,0,0.05);">
+                <p style="font-weight: bold; font-size: 1.25em; margin-bottom: 15px; color: #1a237e;">{icon} {name}</p>
+                <div>
+                    <p style="font-size: 1em; margin-bottom: 5px; color: #37474f;">남은 공간 (가용):</p>
+                    <p style="font-size: 1.5em; font-weight: bold; margin-bottom: 12px; color: #c62828;">{waste:,.1f} mm</p>
+                </div>
+                <div>
+                    <p style="font-size: 1em; margin-bottom: 5px; color: #37474f;">사용 부재 수:</p>
+                    <p style="font-size: 1.5em; font-weight: bold; margin-bottom: 0; color: #00796b;">{count} 개</p>
+                </div>
+            </div>
+            """
+
+_RECOMMENDATION_TEMPLATE = """
+            <div style="background-color: #f0f8ff; border-left: 6px solid #007bff; padding: 20px; border-radius: 8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+                <h4 style="color: #0056b3; margin-top:0; font-family: 'Arial Black', sans-serif; font-size: 1.5em;">🏆 추천 전략 가이드</h4>
+                <p style="font-size: 1.15em; margin-bottom: 12px; line-height: 1.6;">
+                    <span style="font-size: 1.3em;">🗑️</span> <strong>가장 적은 내부 공간 낭비:</strong> <strong style="color:#0056b3;">'{min_waste_name}'</strong>
+                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; (남은 공간: <strong>{min_waste:,.1f} mm</strong>)
+                </p>
+                <p style="font-size: 1.15em; margin-bottom: 12px; line-height: 1.6;">
+                    <span style="font-size: 1.3em;">🧩</span> <strong>가장 적은 부재 사용 (효율적):</strong> <strong style="color:#0056b3;">'{min_pieces_name}'</strong>
+                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; ({min_pieces_count} 개, 남은 공간: {min_pieces_waste:,.1f} mm)
+                </p>
+                <p style="font-size: 1.15em; margin-bottom: 0; line-height: 1.6;">
+                    <span style="font-size: 1.3em;">🎲</span> <strong>가장 많은 부재 사용 (다양한 활용):</strong> <strong style="color:#0056b3;">'{max_pieces_name}'</strong>
+                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; ({max_pieces_count} 개, 남은 공간: {max_pieces_waste:,.1f} mm)
+                </p>
+            </div>
+            """
+
+@st.cache_resource
+def _piece_swatch_html() -> Dict[int, str]:
+    """사이드바 부재 색상 견본 HTML. (서버 프로세스당 1회 생성, 재실행 간 공유)"""
+    return {
+        piece_len: f'<div style="width:22px; height:22px; background-color:{color}; border:2px solid black; margin-top:8px; margin-left:2px; border-radius: 4px;"></div>'
+        for piece_len, color in ACTIVE_COLOR_MAP.items()
+    }
+
 # --- Streamlit 앱 UI ---
 st.set_page_config(layout="wide", page_title="길이 최적화 V5.5 (스타일 혁신)")
 
@@ -327,21 +384,12 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("**사용할 부재 길이 선택 (mm):**")
     selected_piece_types_from_user = []
-
-    active_color_map_sidebar = {}
-    color_idx_sidebar = 0
-    for piece_val_master_sb in AVAILABLE_PIECE_LENGTHS_MASTER:
-        if piece_val_master_sb in PIECE_COLOR_MAP_DEFAULT:
-            active_color_map_sidebar[piece_val_master_sb] = PIECE_COLOR_MAP_DEFAULT[piece_val_master_sb]
-        else:
-            active_color_map_sidebar[piece_val_master_sb] = PLOTLY_COLORS_FALLBACK[color_idx_sidebar % len(PLOTLY_COLORS_FALLBACK)]
-            color_idx_sidebar +=1
+    swatch_html = _piece_swatch_html()
 
     for piece_len in AVAILABLE_PIECE_LENGTHS_MASTER:
         col1, col2 = st.columns([2, 5])
         with col1:
-            color = active_color_map_sidebar.get(piece_len, 'grey')
-            st.markdown(f'<div style="width:22px; height:22px; background-color:{color}; border:2px solid black; margin-top:8px; margin-left:2px; border-radius: 4px;"></div>', unsafe_allow_html=True)
+            st.markdown(swatch_html[piece_len], unsafe_allow_html=True)
         with col2:
             default_checked = False if piece_len == 305 else True  # 🔹 305이면 기본 체크 해제
             if st.checkbox(f"{piece_len:,.0f} mm", value=default_checked, key=f"piece_cb_{piece_len}"):
@@ -390,18 +438,22 @@ if not selected_piece_types_from_user:
 else:
     st.markdown("## 📊 부재 배치 최적화 (4가지 전략)")
 
-    all_strategy_results_data = []
-    for strategy_conf in strategies_config:
-        layout_result = calculate_single_strategy_layout(
-            strategy_name=strategy_conf["name"],
-            optimization_func=strategy_conf["func"],
-            total_length=total_length_input,
-            user_selected_piece_types=copy.deepcopy(selected_piece_types_from_user),
-            base_min_end_margin=base_end_margin,
-            input_alpha_for_margin=input_alpha_for_margin_val,
-            internal_alpha_distribution_method=selected_internal_alpha_dist_label
-        )
-        all_strategy_results_data.append(layout_result)
+    pieces_desc = tuple(sorted(set(selected_piece_types_from_user), reverse=True)) # 모든 전략이 공유하는 정렬된 부재 목록
+
+    common_layout_kwargs = dict(
+        total_length=total_length_input,
+        piece_types_sorted_desc=pieces_desc,
+        base_min_end_margin=base_end_margin,
+        input_alpha_for_margin=input_alpha_for_margin_val,
+        internal_alpha_distribution_method=selected_internal_alpha_dist_label
+    )
+    # 4가지 전략은 서로 독립적이므로 병렬 계산 (numba 커널은 nogil), executor.map 은 입력 순서를 유지
+    with ThreadPoolExecutor(max_workers=len(strategies_config), initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())) as executor:
+        all_strategy_results_data = list(executor.map(
+            lambda strategy_conf: calculate_single_strategy_layout(
+                strategy_name=strategy_conf["name"], optimization_func=strategy_conf["func"], **common_layout_kwargs),
+            strategies_config
+        ))
 
     # 전략 비교 요약 정보 (스타일 개선 - 카드 디자인)
     # st.subheader("💡 전략 핵심 지표 비교")
@@ -414,19 +466,7 @@ else:
             internal_waste_val = res_sum_data.get('internal_alpha_waste',0.0)
             num_pieces_val = res_sum_data['summary'].get('배치된 총 부재 개수',0)
 
-            card_html = f"""
-            <div style="background-color: #ffffff; border: 2px solid #e0e0e0; border-radius: 12px; padding: 20px; text-align: center; margin-bottom: 20px; height: 200px; display: flex; flex-direction: column; justify-content: center; box-shadow: 0 4px 8px rgba(0,0,0,0.05);">
-                <p style="font-weight: bold; font-size: 1.25em; margin-bottom: 15px; color: #1a237e;">{icons[idx]} {strategy_display_name.split(':')[0]}</p>
-                <div>
-                    <p style="font-size: 1em; margin-bottom: 5px; color: #37474f;">남은 공간 (가용):</p>
-                    <p style="font-size: 1.5em; font-weight: bold; margin-bottom: 12px; color: #c62828;">{internal_waste_val:,.1f} mm</p>
-                </div>
-                <div>
-                    <p style="font-size: 1em; margin-bottom: 5px; color: #37474f;">사용 부재 수:</p>
-                    <p style="font-size: 1.5em; font-weight: bold; margin-bottom: 0; color: #00796b;">{num_pieces_val} 개</p>
-                </div>
-            </div>
-            """
+            card_html = _CARD_TEMPLATE.format(icon=icons[idx], name=strategy_display_name.split(':')[0], waste=internal_waste_val, count=num_pieces_val)
             st.markdown(card_html, unsafe_allow_html=True)
     st.markdown("---")
 
@@ -440,12 +480,12 @@ else:
                     if res["status"] == "오류":
                         st.error(f"**{res['strategy_name']}**: {res['message']}")
                         if res["plot_elements"]:
-                            fig = create_plotly_visualization(total_length_input, res["plot_elements"], res["strategy_name"], res["summary"], selected_piece_types_from_user)
-                            st.plotly_chart(fig, use_container_width=True)
+                            fig_dict = build_figure_dict(total_length_input, res["plot_elements"], res["strategy_name"], res["summary"], selected_piece_types_from_user, res["piece_counter"])
+                            st.plotly_chart(go.Figure(fig_dict), use_container_width=True, config=PLOTLY_STATIC_CONFIG)
                     else:
                         if res["plot_elements"]:
-                            fig = create_plotly_visualization(total_length_input, res["plot_elements"], res["strategy_name"], res["summary"], selected_piece_types_from_user)
-                            st.plotly_chart(fig, use_container_width=True)
+                            fig_dict = build_figure_dict(total_length_input, res["plot_elements"], res["strategy_name"], res["summary"], selected_piece_types_from_user, res["piece_counter"])
+                            st.plotly_chart(go.Figure(fig_dict), use_container_width=True, config=PLOTLY_STATIC_CONFIG)
 
                         st.markdown(f"##### {res['strategy_name']} 상세 결과:")
                         summary_text_list = [
@@ -459,8 +499,7 @@ else:
                         st.markdown("\n".join(summary_text_list))
 
                     if res["status"] == "성공" and res["selected_pieces_combination"]:
-                        piece_counts = Counter(res["selected_pieces_combination"])
-                        detail_parts = [f"{piece:,.0f}mm × {count}" for piece, count in sorted(piece_counts.items(), reverse=True)]
+                        detail_parts = [f"{piece:,.0f}mm × {count}" for piece, count in sorted(res["piece_counter"].items(), reverse=True)]
                         st.markdown(f"**사용 부재 상세:** {', '.join(detail_parts)}")
                     elif res["status"] == "성공" and not res["selected_pieces_combination"]:
                             st.markdown("**사용 부재 상세:** 없음")
@@ -484,23 +523,11 @@ else:
             best_for_min_pieces = min(similar_waste_strategies, key=lambda x: x['summary'].get('배치된 총 부재 개수', float('inf')))
             best_for_max_pieces = max(similar_waste_strategies, key=lambda x: x['summary'].get('배치된 총 부재 개수', 0))
 
-            rec_html = f"""
-            <div style="background-color: #f0f8ff; border-left: 6px solid #007bff; padding: 20px; border-radius: 8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
-                <h4 style="color: #0056b3; margin-top:0; font-family: 'Arial Black', sans-serif; font-size: 1.5em;">🏆 추천 전략 가이드</h4>
-                <p style="font-size: 1.15em; margin-bottom: 12px; line-height: 1.6;">
-                    <span style="font-size: 1.3em;">🗑️</span> <strong>가장 적은 내부 공간 낭비:</strong> <strong style="color:#0056b3;">'{best_for_min_internal_waste['strategy_name']}'</strong>
-                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; (남은 공간: <strong>{best_for_min_internal_waste.get('internal_alpha_waste',0):,.1f} mm</strong>)
-                </p>
-                <p style="font-size: 1.15em; margin-bottom: 12px; line-height: 1.6;">
-                    <span style="font-size: 1.3em;">🧩</span> <strong>가장 적은 부재 사용 (효율적):</strong> <strong style="color:#0056b3;">'{best_for_min_pieces['strategy_name']}'</strong>
-                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; ({best_for_min_pieces['summary'].get('배치된 총 부재 개수',0)} 개, 남은 공간: {best_for_min_pieces.get('internal_alpha_waste',0):,.1f} mm)
-                </p>
-                <p style="font-size: 1.15em; margin-bottom: 0; line-height: 1.6;">
-                    <span style="font-size: 1.3em;">🎲</span> <strong>가장 많은 부재 사용 (다양한 활용):</strong> <strong style="color:#0056b3;">'{best_for_max_pieces['strategy_name']}'</strong>
-                    <br>&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp; ({best_for_max_pieces['summary'].get('배치된 총 부재 개수',0)} 개, 남은 공간: {best_for_max_pieces.get('internal_alpha_waste',0):,.1f} mm)
-                </p>
-            </div>
-            """
+            rec_html = _RECOMMENDATION_TEMPLATE.format(
+                min_waste_name=best_for_min_internal_waste['strategy_name'], min_waste=best_for_min_internal_waste.get('internal_alpha_waste',0),
+                min_pieces_name=best_for_min_pieces['strategy_name'], min_pieces_count=best_for_min_pieces['summary'].get('배치된 총 부재 개수',0), min_pieces_waste=best_for_min_pieces.get('internal_alpha_waste',0),
+                max_pieces_name=best_for_max_pieces['strategy_name'], max_pieces_count=best_for_max_pieces['summary'].get('배치된 총 부재 개수',0), max_pieces_waste=best_for_max_pieces.get('internal_alpha_waste',0)
+            )
             st.markdown(rec_html, unsafe_allow_html=True)
         else:
             st.warning("성공적인 배치 결과를 찾을 수 없어 추천을 제공할 수 없습니다.")